@@ -1,9 +1,14 @@
+import time
+_import_started = time.perf_counter()  # Measure cold import time of the app module
+
 from flask import Flask, render_template, request, jsonify, send_from_directory, redirect
 import logging
 import tempfile
 import os
 import sys
-from backend.main import merge_and_calculate
+import threading
+from backend.main import merge_and_calculate, warm_up
+from backend import tracing, ocr_batch
 import json  # Import json module for handling JSON data
 
 # Remove all existing handlers
@@ -53,6 +58,12 @@ def serve_trade():
 def serve_items():
     return send_from_directory('.', 'ftf_items.json')
 
+# Report whether the warm-up phase has finished
+@app.route('/ready')
+def readiness():
+    status = 200 if warm_up_state['ready'] else 503
+    return jsonify(dict(warm_up_state, trace_artifacts_dropped=tracing.get_writer().dropped)), status
+
 # Serve static files (CSS, JS) from the frontend folder
 @app.route('/<path:path>')
 def serve_static(path):
@@ -89,9 +100,14 @@ def process_inventory_route():
                     os.unlink(temp_path)
                 raise
 
+        # Sample this request for tracing, keeping the caller's request id if it sent one
+        trace = tracing.start_trace(request.headers.get('X-Request-ID'))
+        if trace is not None:
+            logger.info(f"Tracing request {trace.request_id}")
+
         # Process the images using merge_and_calculate
         logger.info("Calling merge_and_calculate...")
-        results, total = merge_and_calculate(image_paths, debug_mode=DEBUG_MODE)
+        results, total = merge_and_calculate(image_paths, debug_mode=DEBUG_MODE, trace=trace)
         logger.info(f"Processing complete. Total: {total:.2f}")
 
 
@@ -100,10 +116,13 @@ def process_inventory_route():
             os.unlink(path)
             logger.debug(f"Deleted temporary file: {os.path.basename(path)}")
 
-        return jsonify({
+        response = jsonify({
             'results': results,
             'total': total
         })
+        if trace is not None:
+            response.headers['X-Request-ID'] = trace.request_id
+        return response
 
     except Exception as e:
         logger.error("Error occurred while processing images:", exc_info=True)
@@ -114,12 +133,95 @@ def process_inventory_route():
 #TODO Debug configuration
 DEBUG_MODE = False
 
+# Tracing configuration: fraction of /process requests whose debug artifacts are
+# recorded under <TRACE_DIR>/<request id>/ by a background writer
+TRACE_SAMPLE_RATE = float(os.environ.get('FTF_TRACE_SAMPLE_RATE', '0'))
+TRACE_DIR = os.environ.get('FTF_TRACE_DIR', 'traces')
+TRACE_QUEUE_SIZE = int(os.environ.get('FTF_TRACE_QUEUE_SIZE', '64'))
+TRACE_QUEUE_MB = float(os.environ.get('FTF_TRACE_QUEUE_MB', '64'))  # Memory held by queued artifacts
+TRACE_MAX_REQUESTS = int(os.environ.get('FTF_TRACE_MAX_REQUESTS', '1000'))  # Trace directories kept on disk
+tracing.configure(rate=TRACE_SAMPLE_RATE, trace_dir=TRACE_DIR, max_queue=TRACE_QUEUE_SIZE,
+                  max_queue_bytes=int(TRACE_QUEUE_MB * 2**20), max_traces=TRACE_MAX_REQUESTS)
+
+# OCR micro-batching: calls from concurrent requests arriving within OCR_BATCH_WAIT_MS
+# share Tesseract processes per config. 0 disables batching; keep it off until
+# ocr_parity.py passes and loadtest.py shows a throughput gain on the target hardware.
+OCR_BATCH_WAIT_MS = float(os.environ.get('FTF_OCR_BATCH_WAIT_MS', '0'))
+OCR_BATCH_SIZE = int(os.environ.get('FTF_OCR_BATCH_SIZE', '8'))
+OCR_WORKERS = int(os.environ.get('FTF_OCR_WORKERS', '0')) or None
+OCR_TIMEOUT = float(os.environ.get('FTF_OCR_TIMEOUT', '60'))  # Seconds a batched call may take before failing
+ocr_batch.configure(max_wait_ms=OCR_BATCH_WAIT_MS, max_batch_size=OCR_BATCH_SIZE, workers=OCR_WORKERS,
+                    ocr_timeout=OCR_TIMEOUT)
+
+# Set FTF_WARM_UP=0 to skip preloading (e.g. to measure the cold first request);
+# the instance then reports ready immediately
+WARM_UP_ENABLED = os.environ.get('FTF_WARM_UP', '1') != '0'
+
+# Warm-up state reported by /ready
+warm_up_state = {
+    'ready': False,
+    'warm_up': 'pending',  # pending, running, done, failed or skipped
+    'error': None,
+    'import_seconds': None,
+    'warm_up_seconds': None,
+    'stages': {},
+}
+
+_warm_up_lock = threading.Lock()
+_warm_up_pid = None  # Process that started warm-up, so forked workers start their own
+
+def _run_warm_up():
+    started = time.perf_counter()
+    warm_up_state['warm_up'] = 'running'
+    try:
+        warm_up_state['stages'] = warm_up()
+    except Exception as e:
+        logger.error("Warm-up failed:", exc_info=True)
+        warm_up_state['error'] = str(e)
+    warm_up_state['warm_up_seconds'] = time.perf_counter() - started
+    # A failed warm-up leaves the instance not ready so it is kept out of rotation
+    warm_up_state['warm_up'] = 'done' if warm_up_state['error'] is None else 'failed'
+    warm_up_state['ready'] = warm_up_state['error'] is None
+
+def start_warm_up():
+    """
+    Preload the OCR backend in a background thread so the app can serve static routes immediately.
+    Runs once per process: a worker forked from a preloaded master starts its own warm-up.
+    Returns the thread, or None if warm-up is already running here or is disabled.
+    """
+    global _warm_up_pid
+    with _warm_up_lock:
+        if _warm_up_pid == os.getpid():
+            return None
+        _warm_up_pid = os.getpid()
+        if not WARM_UP_ENABLED:
+            if warm_up_state['warm_up'] == 'pending':
+                warm_up_state['warm_up'] = 'skipped'
+                warm_up_state['ready'] = True
+            return None
+        # State copied from a master process is not this worker's
+        warm_up_state.update(ready=False, warm_up='pending', error=None, warm_up_seconds=None, stages={})
+        thread = threading.Thread(target=_run_warm_up, name='warm-up', daemon=True)
+        thread.start()
+        return thread
+
+# Warm-up starts from the first request each process serves (normally the readiness
+# probe) rather than at import, so pre-fork servers warm up every worker
+@app.before_request
+def _ensure_warm_up():
+    if _warm_up_pid != os.getpid():
+        start_warm_up()
+
+warm_up_state['import_seconds'] = time.perf_counter() - _import_started
+logger.info(f"App imported in {warm_up_state['import_seconds']:.3f}s")
+
 if __name__ == '__main__':
     # Disable Flask's default startup messages
     os.environ['FLASK_ENV'] = 'production'
     cli = sys.modules['flask.cli']
     cli.show_server_banner = lambda *x: None
     
+    start_warm_up()
     logger.info("Starting Flask server at http://127.0.0.1:5000")
     app.run(debug=DEBUG_MODE)
     
@@ -1,6 +1,11 @@
 import cv2
 import numpy as np
 import pytesseract
+from backend import ocr_batch
+from backend.tracing import start_trace, get_writer
+from backend.box_assign import region_edges, ocr_tokens, assign_to_regions, group_by_box
+
+DIGIT_OCR_CONFIG = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789x'
 
 def resize_image(image, target_width, target_height):
     """Resize an image to a specific width and height."""
@@ -49,41 +54,27 @@ def create_corner_mask(image, boxes, corner_percentage):
     
     return mask
 
-def multi_preprocess_and_extract(enhanced_image, boxes, corner_percentage, debug=False):
+def multi_preprocess_and_extract(enhanced_image, boxes, corner_percentage, trace=None):
     """
     Extract OCR results from the enhanced image and assign to boxes.
     Processes numbers with the following rules:
     - Empty boxes get value '1'
     - Removes whitespace and non-digit characters
     - Caps values at 10
+    When a trace is given, the raw and cleaned OCR results are recorded to it.
     """
-    # Initialize box_texts dictionary
-    box_texts = {box["box_number"]: [] for box in boxes}
+    # Corner regions as an edge array, computed once rather than per token
+    corner_edges = region_edges(get_corner_region(box, corner_percentage) for box in boxes)
     
     try:
         # Use tesseract with digit-focused config
-        config = '--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789x'
-        ocr_data = pytesseract.image_to_data(enhanced_image, config=config, 
-                                          output_type=pytesseract.Output.DICT)
+        ocr_data = ocr_batch.image_to_data(enhanced_image, DIGIT_OCR_CONFIG)
         
-        # Process OCR results and assign to boxes
-        for i in range(len(ocr_data["text"])):
-            text = ocr_data["text"][i].strip()
-            if text:  # Ignore empty text
-                x = ocr_data["left"][i]
-                y = ocr_data["top"][i]
-                w = ocr_data["width"][i]
-                h = ocr_data["height"][i]
-                text_center = (x + w // 2, y + h // 2)
-                
-                # Find the box that contains this text
-                for box in boxes:
-                    corner_tl, corner_br = get_corner_region(box, corner_percentage)
-                    # Check if text center is within the corner region
-                    if (corner_tl[0] <= text_center[0] <= corner_br[0] and 
-                        corner_tl[1] <= text_center[1] <= corner_br[1]):
-                        box_texts[box["box_number"]].append(text)
-                        break
+        # Assign every token to the corner region containing its center in one pass
+        texts, centers_x, centers_y = ocr_tokens(ocr_data)
+        box_indices = assign_to_regions(centers_x, centers_y, corner_edges)
+        grouped_texts = group_by_box(texts, box_indices, len(boxes))
+        box_texts = {box["box_number"]: group for box, group in zip(boxes, grouped_texts)}
 
         # Combine texts for each box, remove 'x' characters and handle empty boxes
         combined_box_texts = {}
@@ -103,21 +94,16 @@ def multi_preprocess_and_extract(enhanced_image, boxes, corner_percentage, debug
             
             combined_box_texts[box_number] = cleaned_text
             
-        # Save OCR results if debug is enabled
-        if debug:
-            with open("ocr_results.txt", "w", encoding='utf-8') as f:
-                f.write("=== OCR Results ===\n")
-                f.write(str(box_texts))
-            
-                
-                f.write("\n=== Numbers Only Results ===\n")
-                for box_number in sorted(combined_box_texts.keys()):
-                    text = combined_box_texts[box_number]
-                    if text:  # Only write if there are numbers
-                        numbers_only = extract_numbers_only(text)
-                        if numbers_only:  # Only write if there are numbers
-                            f.write(f"Box {box_number}: {numbers_only}\n")
-                print("OCR results saved to 'ocr_results.txt'")
+        # Record OCR results if tracing is enabled
+        if trace is not None:
+            report = ["=== OCR Results ===\n", str(box_texts), "\n=== Numbers Only Results ===\n"]
+            for box_number in sorted(combined_box_texts.keys()):
+                text = combined_box_texts[box_number]
+                if text:  # Only write if there are numbers
+                    numbers_only = extract_numbers_only(text)
+                    if numbers_only:  # Only write if there are numbers
+                        report.append(f"Box {box_number}: {numbers_only}\n")
+            trace.add_text("ocr_results.txt", "".join(report))
         
         return combined_box_texts
             
@@ -181,9 +167,21 @@ def get_corner_region(box, corner_percentage):
     
     return (int(corner_left), int(corner_top)), (int(corner_right), int(corner_bottom))
 
-def process_inventory(image_path, row_percentage=33.33, col_percentages=None, corner_percentage=20, debug=False):
-    """Process inventory image and extract items."""
-    
+def warm_up():
+    """Run one digit OCR call on a blank frame so the first request starts warm."""
+    blank = np.zeros((64, 64), dtype=np.uint8)
+    pytesseract.image_to_data(blank, config=DIGIT_OCR_CONFIG, output_type=pytesseract.Output.DICT)
+
+def process_inventory(image_path, row_percentage=33.33, col_percentages=None, corner_percentage=20, debug=False, trace=None):
+    """
+    Process inventory image and extract items.
+    The enhanced image and OCR results are recorded to the given trace; debug
+    mode starts one under traces/ when none is given.
+    """
+    if debug and trace is None:
+        trace = start_trace(force=True)
+        print(f"Debug artifacts will be written to trace {trace.request_id}")
+
     # Attempt to load the image
     image = cv2.imread(image_path)
     if image is None:
@@ -210,11 +208,11 @@ def process_inventory(image_path, row_percentage=33.33, col_percentages=None, co
     # Enhance the masked image
     enhanced_image = enhance_image(masked_image)
 
-    if debug:
-        cv2.imwrite("enhanced_image.png", enhanced_image)
+    if trace is not None:
+        trace.add_image("enhanced_image.png", enhanced_image)
 
     # Perform OCR on the enhanced image and assign text to boxes
-    box_texts = multi_preprocess_and_extract(enhanced_image, boxes, corner_percentage, debug=False)
+    box_texts = multi_preprocess_and_extract(enhanced_image, boxes, corner_percentage, trace=trace)
 
     return box_texts
 
@@ -231,4 +229,6 @@ if __name__ == "__main__":
                      row_percentage=row_percentage, 
                      col_percentages=col_percentages, 
                      corner_percentage=corner_percentage,
-                     debug=debug)
\ No newline at end of file
+                     debug=debug)
+    # Debug artifacts are written in the background; wait for them before exiting
+    get_writer().flush()
\ No newline at end of file
@@ -1,18 +1,150 @@
 import cv2
 import numpy as np
 import pytesseract
+from backend import ocr_batch
+from backend.tracing import start_trace
 import json
+import atexit
+import os
+import tempfile
+import threading
 from fuzzywuzzy import fuzz
+from backend.box_assign import ocr_tokens, assign_to_grid, group_by_box
+from backend.name_trie import NameTrie
+
+TEXT_OCR_CONFIG = r'--oem 3 --psm 6'
+
+# Largest edit distance at which raw box text is snapped straight to a catalog name
+MAX_SNAP_DISTANCE = 3
+
+# Set FTF_OCR_USER_WORDS=1 to pass the catalog words to Tesseract as user-words.
+# Off by default until match_check.py shows it does not lower item-match accuracy.
+USE_USER_WORDS = os.environ.get('FTF_OCR_USER_WORDS', '0') == '1'
+
+# Parsed catalog and the matcher structures built from it, filled on the first successful load
+_catalog_lock = threading.Lock()
+_items_cache = None
+_lower_names = {}
+_names_by_lower = {}
+_name_length_range = (0, 0)
+_name_trie = NameTrie()
+_user_words_config = None  # Text config including the user-words file, written on first use
 
 def load_items():
-    """Load items from JSON file."""
+    """
+    Load items from JSON file. The catalog is parsed once and cached; the lock keeps
+    the warm-up thread and a concurrent first request from both building it.
+    """
+    global _items_cache
+    if _items_cache is not None:
+        return _items_cache
+    with _catalog_lock:
+        if _items_cache is not None:
+            return _items_cache
+        try:
+            with open('ftf_items.json', 'r') as f:
+                data = json.load(f)
+                items = {item['name']: item['value'] for item in data['items']}
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print("Error: ftf_items.json could not be loaded")
+            return {}  # Return an empty dictionary or handle as needed
+        build_matcher(items)
+        _items_cache = items
+        return items
+
+def build_matcher(items):
+    """
+    Precompute the structures used to match OCR text against the catalog:
+    the lowercase name tables and the name trie.
+    """
+    global _name_trie, _name_length_range
+    _lower_names.update({name: name.lower() for name in items})
+    _names_by_lower.update({name.lower(): name for name in items})
+    _name_trie = NameTrie(items)
+    if items:
+        lengths = [len(name) for name in items]
+        _name_length_range = (min(lengths), max(lengths))
+
+def write_user_words(items):
+    """
+    Write every word of the catalog names to a Tesseract user-words file, biasing
+    OCR towards valid item names. Returns its path, or None if it cannot be used.
+    The file is created fresh with mkstemp (private, unpredictable name) once per
+    process, so nothing else in the temp directory can supply the vocabulary.
+    """
+    words = sorted({word for name in items for word in name.split()})
     try:
-        with open('ftf_items.json', 'r') as f:
-            data = json.load(f)
-            return {item['name']: item['value'] for item in data['items']}
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print("Error: ftf_items.json could not be loaded")
-        return {}  # Return an empty dictionary or handle as needed
+        fd, path = tempfile.mkstemp(prefix='ftf_user_words_', suffix='.txt')
+    except OSError as e:
+        print(f"Warning: could not create user-words file: {str(e)}")
+        return None
+
+    # Tesseract config strings are split on whitespace, so the path must not contain any
+    if any(char.isspace() for char in path):
+        os.close(fd)
+        os.unlink(path)
+        print("Warning: temp directory path contains spaces, OCR runs without catalog user-words")
+        return None
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write("\n".join(words) + "\n")
+    except OSError as e:
+        print(f"Warning: could not write user-words file: {str(e)}")
+        return None
+    atexit.register(_remove_file, path)
+    return path
+
+def _remove_file(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+def text_ocr_config():
+    """
+    Tesseract config for item names. With USE_USER_WORDS set and the catalog loaded,
+    it includes the catalog user-words file, written on the first call.
+    """
+    global _user_words_config
+    if not USE_USER_WORDS or _items_cache is None:
+        return TEXT_OCR_CONFIG
+    if _user_words_config is None:
+        with _catalog_lock:
+            if _user_words_config is None:
+                path = write_user_words(_items_cache)
+                _user_words_config = f"{TEXT_OCR_CONFIG} --user-words {path}" if path else TEXT_OCR_CONFIG
+    return _user_words_config
+
+def snap_to_catalog(text, items):
+    """
+    Snap raw box text to the catalog name it spells exactly, or to the single name
+    within a small edit distance.
+    Returns the match as {'name', 'value'}, or None if the text is not close to exactly one name.
+    """
+    text = " ".join(text.lower().split())
+
+    # Clean reads are an exact lookup; only misreads pay for the trie search
+    name = _names_by_lower.get(text)
+    if name is None:
+        max_distance = min(MAX_SNAP_DISTANCE, len(text) // 6)
+        shortest, longest = _name_length_range
+        if max_distance == 0 or not shortest - max_distance <= len(text) <= longest + max_distance:
+            return None
+        name = _name_trie.snap(text, max_distance)
+    if name is None or name not in items:
+        return None
+    return {'name': name, 'value': items[name]}
+
+def lower_name(item_name):
+    """Return the lowercase form of an item name, using the precomputed table when possible."""
+    lowered = _lower_names.get(item_name)
+    return lowered if lowered is not None else item_name.lower()
+
+def warm_up():
+    """Load the catalog and run one OCR call on a blank frame so the first request starts warm."""
+    load_items()
+    blank = np.zeros((64, 64, 3), dtype=np.uint8)
+    pytesseract.image_to_data(blank, config=text_ocr_config(), output_type=pytesseract.Output.DICT)
 
 def resize_image(image, target_width, target_height):
     """Resize an image to a specific width and height."""
@@ -42,10 +174,11 @@ def match_items(lines, items, threshold=68, debug=False):
 
         # Perfect matching
         for item_name in items:
-            if item_name.lower() in remaining_line and item_name not in matched_items:
+            item_lower = lower_name(item_name)
+            if item_lower in remaining_line and item_name not in matched_items:
                 found_items.append({'name': item_name, 'value': items[item_name]})
                 matched_items.add(item_name)
-                remaining_line = remaining_line.replace(item_name.lower(), '', 1).strip()
+                remaining_line = remaining_line.replace(item_lower, '', 1).strip()
 
         # Fuzzy matching for unmatched parts
         if remaining_line:
@@ -53,7 +186,7 @@ def match_items(lines, items, threshold=68, debug=False):
             highest_similarity = 0
             for item_name in items:
                 if item_name not in matched_items:
-                    similarity = fuzz.ratio(remaining_line, item_name.lower())
+                    similarity = fuzz.ratio(remaining_line, lower_name(item_name))
                     if debug:
                         print(f"Fuzzy match score for '{remaining_line}' and '{item_name}': {similarity}")  # Log similarity score
                     if similarity > highest_similarity and similarity >= threshold:
@@ -81,8 +214,16 @@ def resolve_tie(line, tied_items):
                 best_match = item
     return best_match
 
-def process_text_inventory(image_path, row_percentage=33.33, col_percentages=None, debug=False):
-    """Process inventory image and extract items."""
+def process_text_inventory(image_path, row_percentage=33.33, col_percentages=None, debug=False, trace=None):
+    """
+    Process inventory image and extract items.
+    The grid, processed image and matching log are recorded to the given trace;
+    debug mode starts one under traces/ when none is given.
+    """
+    if debug and trace is None:
+        trace = start_trace(force=True)
+        print(f"Debug artifacts will be written to trace {trace.request_id}")
+    tracing = trace is not None
     items = load_items()
     if debug:
         print(f"Loaded items from JSON: {items}")
@@ -128,8 +269,8 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
     
     total_boxes = box_number - 1  # Store the actual number of boxes
     
-    # Draw grid lines if debug is enabled
-    if debug:
+    # Draw grid lines if tracing is enabled
+    if tracing:
         grid_image = resized_image.copy()
         
         # Draw and label boxes
@@ -144,10 +285,8 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
             label_position = (top_left[0] + 10, top_left[1] + 30)
             cv2.putText(grid_image, str(box["box_number"]), label_position, cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
         
-        # Save the grid image for visualization
-        grid_output_path = "grid_with_boxes.png"
-        cv2.imwrite(grid_output_path, grid_image)
-        print(f"\nGrid with boxes saved at {grid_output_path}")
+        # Record the grid image for visualization
+        trace.add_image("grid_with_boxes.png", grid_image)
     
     # Perform OCR on the enhanced image
     try:
@@ -167,44 +306,30 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
         enhanced_text_image_bgr = cv2.cvtColor(enhanced_yellow, cv2.COLOR_HSV2BGR)
         enhanced_text_image = cv2.bitwise_and(enhanced_text_image_bgr, enhanced_text_image_bgr, mask=yellow_mask)
         
-        custom_config = r'--oem 3 --psm 6'
-        ocr_data = pytesseract.image_to_data(enhanced_text_image, config=custom_config, output_type=pytesseract.Output.DICT)
+        ocr_data = ocr_batch.image_to_data(enhanced_text_image, text_ocr_config())
         
-        # Save the processed image if debug is enabled
-        if debug:
-            processed_image_path = "processed_image.png"
-            cv2.imwrite(processed_image_path, enhanced_text_image)
-            print(f"\nProcessed image saved at {processed_image_path}")
+        # Record the processed image if tracing is enabled
+        if tracing:
+            trace.add_image("processed_image.png", enhanced_text_image)
             
     except Exception as e:
         print("Error during OCR processing:", str(e))
         return []
 
-    # Match text to boxes
-    box_texts = {box["box_number"]: [] for box in boxes}  # Initialize box text storage
-    for i in range(len(ocr_data["text"])):
-        text = ocr_data["text"][i].strip()
-        if text:  # Ignore empty text
-            x, y, w, h = ocr_data["left"][i], ocr_data["top"][i], ocr_data["width"][i], ocr_data["height"][i]
-            text_center = (x + w // 2, y + h // 2)
-            
-            # Find the box that contains the text
-            for box in boxes:
-                top_left = box["top_left"]
-                bottom_right = box["bottom_right"]
-                if top_left[0] <= text_center[0] <= bottom_right[0] and top_left[1] <= text_center[1] <= bottom_right[1]:
-                    box_texts[box["box_number"]].append(text)
-                    break
-    
+    # Match text to boxes: look up every token's grid cell at once from the grid lines
+    texts, centers_x, centers_y = ocr_tokens(ocr_data)
+    box_indices = assign_to_grid(centers_x, centers_y, col_positions, row_positions)
+    grouped_texts = group_by_box(texts, box_indices, len(boxes))
+
     # Combine all text from each box into a single string
-    combined_box_texts = {box_number: " ".join(texts) for box_number, texts in box_texts.items()}
+    combined_box_texts = {box["box_number"]: " ".join(group) for box, group in zip(boxes, grouped_texts)}
     
     # First pass: Get all potential matches for each box
     all_matches = {}  # Store all initial matches with scores
     best_matches_per_box = {}  # Store best match for each box
     items_to_boxes = {}  # Track which boxes have each item as their best match
     
-    if debug:
+    if tracing:
         debug_log = []
         debug_log.append("=== Debug Log for Item Matching Process ===\n")
 
@@ -212,25 +337,26 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
     for box_number in range(1, len(boxes) + 1):
         combined_text = combined_box_texts.get(box_number, "").strip()
         
-        if debug:
+        if tracing:
             debug_log.append(f"\n=== Initial Matching: Box {box_number} ===")
             debug_log.append(f"Raw detected text: '{combined_text}'")
         
         if not combined_text:
             print(f"Box {box_number} - Empty (No text detected)")
-            if debug:
+            if tracing:
                 debug_log.append("Result: No text detected in box")
             continue
 
-        # Get matches for this box
-        matched_items = match_items([combined_text], items)
+        # Get matches for this box, skipping the fuzzy search when the text snaps to one name
+        snapped = snap_to_catalog(combined_text, items)
+        matched_items = [snapped] if snapped else match_items([combined_text], items)
         if matched_items:
             all_matches[box_number] = {
                 'text': combined_text,
                 'matches': []
             }
             
-            if debug:
+            if tracing:
                 debug_log.append("\nPotential matches:")
             
             # Store all matches with their scores
@@ -243,7 +369,7 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
                 }
                 all_matches[box_number]['matches'].append(match_info)
                 
-                if debug:
+                if tracing:
                     debug_log.append(f"  - {item['name']}: Score {similarity}, Value {item['value']}")
 
             # Identify best match for this box
@@ -261,7 +387,7 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
     # Identify duplicates (items that are best match for multiple boxes)
     duplicate_items = {item: boxes for item, boxes in items_to_boxes.items() if len(boxes) > 1}
     
-    if debug and duplicate_items:
+    if tracing and duplicate_items:
         debug_log.append("\n=== Duplicate Items Found ===")
         for item, boxes in duplicate_items.items():
             debug_log.append(f"\n{item} is best match for boxes: {[b['box'] for b in boxes]}")
@@ -276,12 +402,12 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
         if best_match['name'] not in duplicate_items:
             final_matches[box_number] = best_match
             used_items.add(best_match['name'])
-            if debug:
+            if tracing:
                 debug_log.append(f"\nBox {box_number}: Assigned non-duplicate {best_match['name']} (Score: {best_match['score']})")
 
     # Handle duplicates
     for item_name, box_matches in duplicate_items.items():
-        if debug:
+        if tracing:
             debug_log.append(f"\n=== Resolving duplicate: {item_name} ===")
         
         # Sort boxes by score for this item
@@ -293,7 +419,7 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
         final_matches[best_box] = best_matches_per_box[best_box]
         used_items.add(item_name)
         
-        if debug:
+        if tracing:
             debug_log.append(f"Assigned {item_name} to Box {best_box} (Score: {best_score})")
 
         # Rematch other boxes that had this as best match
@@ -301,7 +427,7 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
             box_number = box_info['box']
             original_text = all_matches[box_number]['text']
             
-            if debug:
+            if tracing:
                 debug_log.append(f"\nRematching Box {box_number}")
                 debug_log.append(f"Original text: '{original_text}'")
                 debug_log.append("Excluding matched items: " + ", ".join(used_items))
@@ -322,10 +448,10 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
                 }
                 used_items.add(new_match['name'])
                 
-                if debug:
+                if tracing:
                     debug_log.append(f"Found new match: {new_match['name']} (Score: {new_score})")
             else:
-                if debug:
+                if tracing:
                     debug_log.append(f"No alternative match found for Box {box_number}")
                 print(f"Box {box_number} - No alternative match found. Raw text: '{original_text}'")
 
@@ -336,17 +462,19 @@ def process_text_inventory(image_path, row_percentage=33.33, col_percentages=Non
             match = final_matches[box_number]
             match['value'] = round(match['value'], 3)  # Round to 3 decimal places
             print(f"Box {box_number} - {match['name']}: {match['value']}")
+
+    if tracing:
+        for box_number in sorted(final_matches.keys()):
+            match = final_matches[box_number]
             debug_log.append(f"\nFinal: Box {box_number}: {match['name']} (Score: {match['score']}, Value: {match['value']})")
-        
+
 
     if debug:# Print summary
         print(f"\nTotal Boxes: {total_boxes}")
         print(f"Total Extracted Items: {len(final_matches)}")
         print(f"Total Value: {round(sum(item['value'] for item in final_matches.values()), 2)}")
     
-    if debug:
-        with open("matching_debug.txt", "w", encoding='utf-8') as f:
-            f.write("\n".join(debug_log))
-        print("\nDebug log saved to 'matching_debug.txt'")
+    if tracing:
+        trace.add_text("matching_debug.txt", "\n".join(debug_log))
     
     return final_matches
@@ -0,0 +1,51 @@
+import numpy as np
+
+def region_edges(regions):
+    """Stack (top_left, bottom_right) regions into an (N, 4) array of left, top, right, bottom edges."""
+    return np.array([(tl[0], tl[1], br[0], br[1]) for tl, br in regions], dtype=np.int64).reshape(-1, 4)
+
+def ocr_tokens(ocr_data):
+    """
+    Turn Tesseract image_to_data output into arrays.
+    Returns the non-empty (stripped) token texts and the x and y of their centers.
+    """
+    texts = np.char.strip(np.asarray(ocr_data["text"], dtype=str))
+    keep = texts != ''
+    left = np.asarray(ocr_data["left"], dtype=np.int64)[keep]
+    top = np.asarray(ocr_data["top"], dtype=np.int64)[keep]
+    width = np.asarray(ocr_data["width"], dtype=np.int64)[keep]
+    height = np.asarray(ocr_data["height"], dtype=np.int64)[keep]
+    return texts[keep], left + width // 2, top + height // 2
+
+def assign_to_regions(centers_x, centers_y, edges):
+    """
+    Index of the first region (edges inclusive) containing each center, or -1.
+    Checks every token against every region in one broadcasted comparison.
+    """
+    x = centers_x[:, None]
+    y = centers_y[:, None]
+    inside = (x >= edges[:, 0]) & (x <= edges[:, 2]) & (y >= edges[:, 1]) & (y <= edges[:, 3])
+    return np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+
+def assign_to_grid(centers_x, centers_y, col_positions, row_positions):
+    """
+    Index of the grid box (row-major) containing each center, or -1 if outside the grid.
+    col_positions and row_positions are the grid lines including both image edges.
+    A center lying on a shared line goes to the earlier box, like a first-match scan would.
+    """
+    cols = np.asarray(col_positions)
+    rows = np.asarray(row_positions)
+    col = np.maximum(np.searchsorted(cols, centers_x, side='left'), 1) - 1
+    row = np.maximum(np.searchsorted(rows, centers_y, side='left'), 1) - 1
+    inside = ((centers_x >= cols[0]) & (centers_x <= cols[-1]) &
+              (centers_y >= rows[0]) & (centers_y <= rows[-1]))
+    return np.where(inside, row * (len(cols) - 1) + col, -1)
+
+def group_by_box(texts, box_indices, box_count):
+    """Group token texts per box index, keeping OCR order within each box."""
+    valid = box_indices >= 0
+    indices = box_indices[valid]
+    order = np.argsort(indices, kind='stable')
+    counts = np.bincount(indices, minlength=box_count)
+    groups = np.split(texts[valid][order], np.cumsum(counts)[:-1])
+    return [group.tolist() for group in groups]
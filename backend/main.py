@@ -1,21 +1,29 @@
-from backend.Number_Extract import process_inventory
-from backend.Text_Extract import process_text_inventory
-import json 
 import os
+import time
 import logging
+from backend import tracing
 
 # Get logger for this module
 logger = logging.getLogger(__name__)
 
-def merge_and_calculate(image_paths, debug_mode=False):
+def merge_and_calculate(image_paths, debug_mode=False, trace=None):
     """
     Merge quantity data from Number_Extract with item data from Text_Extract
     and calculate the total value for each item across multiple images.
+    Debug artifacts are recorded to the given trace; debug mode always traces.
     """
+    # The extractors pull in cv2, numpy, pytesseract and fuzzywuzzy, so they are
+    # imported on first use rather than when the app starts
+    from backend.Number_Extract import process_inventory
+    from backend.Text_Extract import process_text_inventory
+
     # Log only filenames instead of full paths
     image_names = [os.path.basename(path) for path in image_paths]
     logger.debug(f"merge_and_calculate called with images: {image_names}")
     
+    if debug_mode and trace is None:
+        trace = tracing.start_trace(force=True)
+
     # Initialize results dictionary
     results = []  # List to store results from each image
     total = 0
@@ -26,10 +34,13 @@ def merge_and_calculate(image_paths, debug_mode=False):
         image_name = os.path.basename(image_path)
         logger.debug(f"Processing image {image_idx+1}/{len(image_paths)}: {image_name}")
         
+        # Keep each image's artifacts apart within the request's trace
+        image_trace = trace.scoped(f"image{image_idx + 1}_") if trace is not None else None
+
         # Process the image for quantities
-        combined_box_texts = process_inventory(image_path, debug=debug_mode)
+        combined_box_texts = process_inventory(image_path, debug=debug_mode, trace=image_trace)
         # Process the image for item identification
-        final_matches = process_text_inventory(image_path, debug=debug_mode)
+        final_matches = process_text_inventory(image_path, debug=debug_mode, trace=image_trace)
         
         # Create results for this image
         image_results = []
@@ -67,17 +78,37 @@ def merge_and_calculate(image_paths, debug_mode=False):
         item.pop('box_number', None)
         item.pop('image_name', None)
 
-    # Save debug output if enabled
-    if debug_mode:
+    # Record the final output if tracing is enabled
+    if trace is not None:
         output = {
-            'items': results,
+            'items': [dict(item) for item in results],
             'total': total
         }
-        try:
-            with open('inventory_results.json', 'w') as f:
-                json.dump(output, f, indent=4)
-            logger.debug("Debug results saved to inventory_results.json")
-        except Exception as e:
-            logger.error(f"Failed to save debug results: {str(e)}")
+        trace.add_json('inventory_results.json', output)
+        logger.debug(f"Trace {trace.request_id} queued inventory_results.json")
     
-    return results, total
\ No newline at end of file
+    return results, total
+
+def warm_up():
+    """
+    Preload the item catalog, build the matcher structures and run one dummy OCR
+    call per config so the first real request does not pay for them.
+    Returns the time spent in each stage, in seconds.
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    from backend import Number_Extract, Text_Extract
+    timings['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Text_Extract.load_items()
+    timings['catalog'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Number_Extract.warm_up()
+    Text_Extract.warm_up()
+    timings['ocr'] = time.perf_counter() - start
+
+    logger.info("Warm-up complete: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in timings.items()))
+    return timings
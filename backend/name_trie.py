@@ -0,0 +1,56 @@
+class _Node:
+    __slots__ = ('children', 'name')
+
+    def __init__(self):
+        self.children = {}
+        self.name = None  # Catalog name ending at this node
+
+class NameTrie:
+    """
+    Prefix trie of lowercase catalog names.
+    search() walks the trie with one Levenshtein row per node, so branches whose
+    best possible distance already exceeds the bound are never visited.
+    """
+
+    def __init__(self, names=()):
+        self.root = _Node()
+        for name in names:
+            self.insert(name)
+
+    def insert(self, name):
+        node = self.root
+        for char in name.lower():
+            node = node.children.setdefault(char, _Node())
+        node.name = name
+
+    def search(self, word, max_distance):
+        """Return (distance, name) for every name within max_distance edits of word, closest first."""
+        word = word.lower()
+        results = []
+        first_row = list(range(len(word) + 1))
+        for char, child in self.root.children.items():
+            self._search(child, char, word, first_row, max_distance, results)
+        results.sort()
+        return results
+
+    def _search(self, node, char, word, previous_row, max_distance, results):
+        row = [previous_row[0] + 1]
+        for i in range(1, len(word) + 1):
+            cost = 0 if word[i - 1] == char else 1
+            row.append(min(row[i - 1] + 1, previous_row[i] + 1, previous_row[i - 1] + cost))
+
+        if node.name is not None and row[-1] <= max_distance:
+            results.append((row[-1], node.name))
+
+        if min(row) <= max_distance:
+            for next_char, child in node.children.items():
+                self._search(child, next_char, word, row, max_distance, results)
+
+    def snap(self, word, max_distance):
+        """Return the single closest name within max_distance, or None if there is none or a tie."""
+        matches = self.search(word, max_distance)
+        if not matches:
+            return None
+        if len(matches) > 1 and matches[1][0] == matches[0][0]:
+            return None
+        return matches[0][1]
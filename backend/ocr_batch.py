@@ -0,0 +1,168 @@
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+def write_page_list(images, directory):
+    """
+    Save each image as a PNG and write a Tesseract list file naming them, one page per image.
+    Images are saved the way pytesseract saves arrays, so Tesseract sees the same pixels.
+    Returns the path of the list file.
+    """
+    from PIL import Image
+
+    paths = []
+    for index, image in enumerate(images):
+        path = os.path.join(directory, f"page{index}.png")
+        Image.fromarray(image).save(path)
+        paths.append(path)
+    list_path = os.path.join(directory, "pages.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(paths) + "\n")
+    return list_path
+
+def split_pages(ocr_data, page_count):
+    """Split image_to_data output of a multi-page run into one result per page, numbered as page 1."""
+    page_nums = ocr_data.get("page_num", [])
+    results = []
+    for page in range(1, page_count + 1):
+        token_indices = [i for i, page_num in enumerate(page_nums) if page_num == page]
+        result = {key: [values[i] for i in token_indices] for key, values in ocr_data.items()}
+        result["page_num"] = [1] * len(token_indices)
+        results.append(result)
+    return results
+
+def _run_tesseract(image, config):
+    import pytesseract
+    return pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+
+def _run_tesseract_pages(images, config):
+    """OCR several images in one Tesseract process; each is recognized as its own page."""
+    directory = tempfile.mkdtemp(prefix='ftf_ocr_batch_')
+    try:
+        list_path = write_page_list(images, directory)
+        return split_pages(_run_tesseract(list_path, config), len(images))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+class OCRBatcher:
+    """
+    Micro-batches OCR calls from concurrent requests.
+    Calls arriving within max_wait_ms of the first one are grouped by Tesseract config
+    and each group is OCRed in batches of up to max_batch_size pages per Tesseract
+    process, saving the process start and model load per call; up to `workers`
+    batches run in parallel. Images are passed as separate
+    pages, so each is binarized and laid out exactly as in a direct call.
+    """
+
+    def __init__(self, max_wait_ms=5, max_batch_size=8, workers=None, ocr_timeout=60.0):
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.ocr_timeout = ocr_timeout
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ocr-batch')
+        self._thread = threading.Thread(target=self._collect, name='ocr-batcher', daemon=True)
+        self._thread.start()
+
+    def image_to_data(self, image, config):
+        """
+        Queue one image for OCR and wait for its tokens.
+        Raises TimeoutError if no result arrives within the latency budget plus the OCR timeout.
+        """
+        future = Future()
+        self._queue.put((image, config, future))
+        return future.result(timeout=self.max_wait + self.ocr_timeout)
+
+    def _collect(self):
+        while True:
+            pending = {}
+            entry = self._queue.get()
+            try:
+                self._add(pending, entry)
+                deadline = time.perf_counter() + self.max_wait
+                while True:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        entry = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    self._add(pending, entry)
+                for key in list(pending):
+                    self._dispatch(key[0], pending[key])
+                    pending[key] = []
+            except Exception as e:
+                # Fail the waiting callers instead of letting the collector die and hang them
+                logger.error(f"OCR batcher failed to schedule a batch: {str(e)}")
+                waiting = [entry] + [item for entries in pending.values() for item in entries]
+                for _, _, future in waiting:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _add(self, pending, entry):
+        image, config, _ = entry
+        key = (config, image.shape[2:], image.dtype)
+        entries = pending.setdefault(key, [])
+        entries.append(entry)
+        if len(entries) >= self.max_batch_size:
+            self._dispatch(config, entries)
+            pending[key] = []
+
+    def _dispatch(self, config, entries):
+        """
+        Submit a group as batches of up to max_batch_size pages. The batch size alone
+        decides how many pages share a Tesseract process; the worker count only limits
+        how many batches run at once.
+        """
+        for start in range(0, len(entries), self.max_batch_size):
+            self._executor.submit(self._run_batch, config, entries[start:start + self.max_batch_size])
+
+    def _run_batch(self, config, entries):
+        futures = [future for _, _, future in entries]
+        try:
+            if len(entries) == 1:
+                results = [_run_tesseract(entries[0][0], config)]
+            else:
+                results = _run_tesseract_pages([image for image, _, _ in entries], config)
+                logger.debug(f"OCR batch of {len(entries)} images with config '{config}'")
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if len(results) != len(futures):
+            error = RuntimeError(f"OCR batch returned {len(results)} results for {len(futures)} images")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+# Shared batcher, created by configure(); OCR runs directly when it is None
+_batcher = None
+
+def configure(max_wait_ms=0, max_batch_size=8, workers=None, ocr_timeout=60.0):
+    """Enable micro-batching with the given latency budget, or disable it with max_wait_ms=0."""
+    global _batcher
+    if max_wait_ms > 0:
+        _batcher = OCRBatcher(max_wait_ms=max_wait_ms, max_batch_size=max_batch_size,
+                              workers=workers, ocr_timeout=ocr_timeout)
+    else:
+        _batcher = None
+
+def image_to_data(image, config):
+    """Run Tesseract image_to_data (DICT output), through the shared batcher if enabled."""
+    if _batcher is None:
+        return _run_tesseract(image, config)
+    return _batcher.image_to_data(image, config)
@@ -0,0 +1,177 @@
+import collections
+import json
+import logging
+import os
+import queue
+import random
+import re
+import shutil
+import threading
+import uuid
+
+# Get logger for this module
+logger = logging.getLogger(__name__)
+
+_REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+class TraceWriter:
+    """
+    Writes trace artifacts from a background thread.
+    Artifacts are queued without blocking. The queue is bounded both by entry count
+    and by the bytes of the payloads it holds (images are queued unencoded); when
+    either bound is reached artifacts are dropped, so tracing never adds latency or
+    unbounded memory to the request that produced them.
+    Only the newest max_traces request directories are kept on disk.
+    """
+
+    def __init__(self, trace_dir='traces', max_queue=64, max_queue_bytes=64 * 2**20, max_traces=1000):
+        self.trace_dir = trace_dir
+        self.max_queue_bytes = max_queue_bytes
+        self.max_traces = max_traces
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._queued_bytes = 0
+        self._directories = None  # Request directories on disk, oldest first
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, request_id, name, kind, payload):
+        """Queue one artifact for writing. Returns False if it was dropped."""
+        self._ensure_started()
+        size = _payload_size(kind, payload)
+        with self._lock:
+            accepted = self._queued_bytes + size <= self.max_queue_bytes
+            if accepted:
+                try:
+                    self._queue.put_nowait((request_id, name, kind, payload, size))
+                    self._queued_bytes += size
+                except queue.Full:
+                    accepted = False
+            if not accepted:
+                self.dropped += 1
+                dropped = self.dropped
+        if not accepted:
+            # Log the first drop and then every hundredth so a saturated writer is noticed
+            if dropped == 1 or dropped % 100 == 0:
+                logger.warning(f"Trace writer is saturated, {dropped} artifacts dropped so far")
+            return False
+        return True
+
+    def flush(self):
+        """Block until every queued artifact has been written."""
+        self._queue.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='trace-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            request_id, name, kind, payload, size = self._queue.get()
+            try:
+                self._write(request_id, name, kind, payload)
+            except Exception as e:
+                logger.error(f"Failed to write trace artifact {name} for request {request_id}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._queued_bytes -= size
+                self._queue.task_done()
+
+    def _write(self, request_id, name, kind, payload):
+        directory = os.path.join(self.trace_dir, request_id)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+            self._track_directory(directory)
+        path = os.path.join(directory, name)
+        if kind == 'image':
+            import cv2
+            cv2.imwrite(path, payload)
+        elif kind == 'json':
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=4)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+
+    def _track_directory(self, directory):
+        """Record a new request directory and remove the oldest ones beyond max_traces."""
+        if self._directories is None:
+            # Pick up traces left by earlier runs, oldest first
+            entries = [entry for entry in os.scandir(self.trace_dir) if entry.is_dir()]
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            self._directories = collections.deque(entry.path for entry in entries)
+        else:
+            self._directories.append(directory)
+        while len(self._directories) > self.max_traces:
+            shutil.rmtree(self._directories.popleft(), ignore_errors=True)
+
+def _payload_size(kind, payload):
+    """Approximate bytes held by a queued payload."""
+    if kind == 'image':
+        return payload.nbytes
+    if kind == 'text':
+        return len(payload)
+    return 0  # JSON results are a few kilobytes at most
+
+class Trace:
+    """
+    Collects the debug artifacts of a single request under its request id.
+    Payloads are handed to the writer as-is, so callers must not modify them afterwards.
+    """
+
+    def __init__(self, request_id, writer, prefix=''):
+        self.request_id = request_id
+        self.writer = writer
+        self.prefix = prefix
+
+    def scoped(self, prefix):
+        """Return a view of this trace that prefixes artifact names, e.g. per image."""
+        return Trace(self.request_id, self.writer, self.prefix + prefix)
+
+    def add_image(self, name, image):
+        self.writer.submit(self.request_id, self.prefix + name, 'image', image)
+
+    def add_text(self, name, text):
+        self.writer.submit(self.request_id, self.prefix + name, 'text', text)
+
+    def add_json(self, name, data):
+        self.writer.submit(self.request_id, self.prefix + name, 'json', data)
+
+# Module-level configuration, set through configure()
+sample_rate = 0.0
+_writer = TraceWriter()
+
+def configure(rate=None, trace_dir=None, max_queue=None, max_queue_bytes=None, max_traces=None):
+    """
+    Set the sampling rate (0.0 to 1.0) and the writer's output directory, queue bounds
+    (entries and payload bytes) and the number of request directories to keep.
+    """
+    global sample_rate, _writer
+    if rate is not None:
+        sample_rate = min(max(float(rate), 0.0), 1.0)
+    if any(value is not None for value in (trace_dir, max_queue, max_queue_bytes, max_traces)):
+        _writer = TraceWriter(
+            trace_dir=trace_dir if trace_dir is not None else _writer.trace_dir,
+            max_queue=max_queue if max_queue is not None else _writer._queue.maxsize,
+            max_queue_bytes=max_queue_bytes if max_queue_bytes is not None else _writer.max_queue_bytes,
+            max_traces=max_traces if max_traces is not None else _writer.max_traces,
+        )
+
+def get_writer():
+    return _writer
+
+def start_trace(request_id=None, force=False):
+    """
+    Start a trace for one request if it is sampled (or force is set), otherwise return None.
+    The trace id is the caller's request id plus a unique suffix, so repeated ids never
+    share a directory. Request ids that are not safe as a directory name are replaced.
+    """
+    if not force and (sample_rate <= 0 or random.random() >= sample_rate):
+        return None
+    if not request_id or not _REQUEST_ID_PATTERN.fullmatch(request_id):
+        return Trace(uuid.uuid4().hex, _writer)
+    return Trace(f"{request_id}-{uuid.uuid4().hex[:8]}", _writer)
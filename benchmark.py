@@ -0,0 +1,164 @@
+"""
+Cold-start benchmark for the calculator backend.
+
+Measures, each in a fresh interpreter so nothing is already imported or cached:
+- how long importing app.py takes
+- how long importing the OCR extractors (cv2, numpy, pytesseract, fuzzywuzzy) takes
+- the first /process request without warm-up versus the one after it
+- the warm-up phase and the first /process request after it
+
+Usage:
+    python benchmark.py [--image screenshot.png] [--json bench.json]
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+SCREEN_WIDTH, SCREEN_HEIGHT = 1537, 850
+
+
+def make_synthetic_screenshot(seed=0, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+    """
+    Draw an inventory-like frame: a 3x5 grid with a yellow item name in each box
+    and a white 'xN' quantity in its top-right corner. Returns PNG bytes.
+    """
+    import random
+    import cv2
+    import numpy as np
+
+    with open(os.path.join(ROOT, 'ftf_items.json'), 'r') as f:
+        names = [item['name'] for item in json.load(f)['items']]
+
+    rng = random.Random(seed)
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    box_width, box_height = width // 5, height // 3
+    for row in range(3):
+        for col in range(5):
+            left, top = col * box_width, row * box_height
+            name = rng.choice(names)
+            cv2.putText(image, name, (left + 10, top + box_height - 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            cv2.putText(image, f"x{rng.randint(1, 10)}", (left + box_width - 45, top + 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+
+    ok, encoded = cv2.imencode('.png', image)
+    if not ok:
+        raise RuntimeError("Failed to encode synthetic screenshot")
+    return encoded.tobytes()
+
+
+def load_fixture(image_path=None, seed=0):
+    """Return PNG bytes for the given screenshot, or a synthetic one."""
+    if image_path:
+        with open(image_path, 'rb') as f:
+            return f.read()
+    return make_synthetic_screenshot(seed)
+
+
+def _post_image(client, image_bytes):
+    started = time.perf_counter()
+    response = client.post('/process', data={
+        'image': (io.BytesIO(image_bytes), 'screenshot.png'),
+        'device': 'benchmark',
+    }, content_type='multipart/form-data')
+    elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"/process returned {response.status_code}")
+    return elapsed
+
+
+def _child(mode, image_path):
+    """Run one measurement inside a fresh interpreter and print it as JSON."""
+    os.environ['FTF_WARM_UP'] = '0'
+    result = {}
+
+    started = time.perf_counter()
+    if mode == 'import-app':
+        import app  # noqa: F401
+        result['seconds'] = time.perf_counter() - started
+    elif mode == 'import-ocr':
+        import backend.Number_Extract  # noqa: F401
+        import backend.Text_Extract  # noqa: F401
+        result['seconds'] = time.perf_counter() - started
+    else:
+        import app
+        # The parent always passes a file, so this only reads bytes and the first
+        # request still pays for importing cv2 and numpy
+        with open(image_path, 'rb') as f:
+            image_bytes = f.read()
+        client = app.app.test_client()
+        if mode == 'warm':
+            started = time.perf_counter()
+            app._run_warm_up()
+            result['warm_up_seconds'] = time.perf_counter() - started
+        result['first_request_seconds'] = _post_image(client, image_bytes)
+        result['second_request_seconds'] = _post_image(client, image_bytes)
+
+    print(json.dumps(result))
+
+
+def _run_child(mode, image_path):
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode]
+    if image_path:
+        command += ['--image', os.path.abspath(image_path)]
+    output = subprocess.run(command, cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmark(image_path=None):
+    """Run every cold-start measurement and return them as a flat dictionary."""
+    # Generate the synthetic fixture here rather than in the children, so they never
+    # import cv2 or numpy before the request being measured
+    fixture_path = None
+    if not image_path:
+        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
+            f.write(make_synthetic_screenshot())
+        image_path = fixture_path = f.name
+    try:
+        cold = _run_child('cold', image_path)
+        warm = _run_child('warm', image_path)
+        import_app = _run_child('import-app', image_path)
+        import_ocr = _run_child('import-ocr', image_path)
+    finally:
+        if fixture_path:
+            os.unlink(fixture_path)
+    return {
+        'import_app_seconds': import_app['seconds'],
+        'import_ocr_seconds': import_ocr['seconds'],
+        'cold_first_request_seconds': cold['first_request_seconds'],
+        'cold_second_request_seconds': cold['second_request_seconds'],
+        'first_request_penalty_seconds': cold['first_request_seconds'] - cold['second_request_seconds'],
+        'warm_up_seconds': warm['warm_up_seconds'],
+        'warm_first_request_seconds': warm['first_request_seconds'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and first-request latency.")
+    parser.add_argument('--image', help="screenshot to post to /process (default: synthetic frame)")
+    parser.add_argument('--json', help="also write the results to this JSON file")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.image)
+        return
+
+    results = run_benchmark(args.image)
+    for name, seconds in results.items():
+        print(f"{name}: {seconds:.4f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Load generator for the /process endpoint.
+
+Drives /process either in-process through the Flask test client or against a running
+server (--url), using synthetic inventory screenshots or the given --image files.
+Reports throughput, latency percentiles, error and 503 rates and RSS over time (the
+server's with --url --server-pid, otherwise this process's, which hosts the app),
+and writes everything to a JSON report so capacity can be compared across changes.
+
+Examples:
+    python loadtest.py --concurrency 8 --requests 200
+    FTF_OCR_BATCH_WAIT_MS=5 python loadtest.py --concurrency 8 --requests 200 --output batched.json
+    python loadtest.py --url http://127.0.0.1:5000 --server-pid 1234 --rate 5 --duration 60 --output load.json
+"""
+import argparse
+import io
+import json
+import math
+import os
+import queue
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from benchmark import load_fixture
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct * len(sorted_values) / 100) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def read_rss(pid):
+    """Resident set size of a process in bytes, or None if it cannot be read."""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except Exception:
+        return None
+
+
+class TestClientTarget:
+    """Sends requests to the app in this process through the Flask test client."""
+
+    def __init__(self):
+        import app
+        self.app = app.app
+        self.pid = os.getpid()
+        self._local = threading.local()
+
+    def wait_ready(self, timeout):
+        client = self.app.test_client()
+        deadline = time.perf_counter() + timeout
+        while client.get('/ready').status_code != 200:
+            if time.perf_counter() > deadline:
+                raise RuntimeError("App did not become ready in time")
+            time.sleep(0.1)
+
+    def post(self, images):
+        # Test clients are not shared between threads
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        data = {'image': [(io.BytesIO(image), f'screenshot{i}.png') for i, image in enumerate(images)],
+                'device': 'loadtest'}
+        response = client.post('/process', data=data, content_type='multipart/form-data')
+        return response.status_code
+
+
+class HTTPTarget:
+    """Sends requests to a running server over HTTP."""
+
+    def __init__(self, url, pid=None):
+        self.url = url.rstrip('/')
+        self.pid = pid
+
+    def wait_ready(self, timeout):
+        deadline = time.perf_counter() + timeout
+        while True:
+            try:
+                with urllib.request.urlopen(f'{self.url}/ready', timeout=5) as response:
+                    if response.status == 200:
+                        return
+            except (urllib.error.URLError, OSError):
+                pass
+            if time.perf_counter() > deadline:
+                raise RuntimeError("Server did not become ready in time")
+            time.sleep(0.2)
+
+    def post(self, images):
+        boundary = uuid.uuid4().hex
+        body = io.BytesIO()
+        for i, image in enumerate(images):
+            body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="image"; '
+                       f'filename="screenshot{i}.png"\r\nContent-Type: image/png\r\n\r\n'.encode())
+            body.write(image)
+            body.write(b'\r\n')
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="device"\r\n\r\n'
+                   f'loadtest\r\n--{boundary}--\r\n'.encode())
+        request = urllib.request.Request(f'{self.url}/process', data=body.getvalue(), method='POST',
+                                         headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        try:
+            with urllib.request.urlopen(request, timeout=300) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def run_load(target, fixtures, concurrency=4, images_per_request=1, rate=0.0,
+             total_requests=100, duration=None, rss_interval=0.5, seed=0):
+    """
+    Send requests to the target and collect per-request results and RSS samples.
+    With rate > 0 requests arrive open-loop (Poisson) at that many per second and
+    latency includes time spent waiting for a free worker; otherwise each worker
+    sends its next request as soon as the previous one finishes.
+    """
+    rng = random.Random(seed)
+    # Closed loop keeps at most one request token per worker queued, so little is left
+    # to drain once the duration is up
+    arrivals = queue.Queue(maxsize=concurrency if rate <= 0 else 0)
+    records = []
+    records_lock = threading.Lock()
+    rss_samples = []
+    done = threading.Event()
+    started = time.perf_counter()
+
+    def out_of_budget(sent):
+        if duration is not None:
+            return time.perf_counter() - started >= duration
+        return sent >= total_requests
+
+    def produce():
+        sent = 0
+        next_arrival = time.perf_counter()
+        while not out_of_budget(sent):
+            if rate > 0:
+                next_arrival += rng.expovariate(rate)
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                arrivals.put(next_arrival)
+            else:
+                arrivals.put(None)
+            sent += 1
+        for _ in range(concurrency):
+            arrivals.put(False)
+
+    def work(worker_index):
+        worker_rng = random.Random(seed + worker_index + 1)
+        while True:
+            scheduled = arrivals.get()
+            if scheduled is False:
+                return
+            # In closed loop, tokens left over after the deadline are not sent
+            if scheduled is None and duration is not None and time.perf_counter() - started >= duration:
+                continue
+            images = [worker_rng.choice(fixtures) for _ in range(images_per_request)]
+            sent_at = time.perf_counter()
+            try:
+                status = target.post(images)
+                error = None
+            except Exception as e:
+                status, error = None, str(e)
+            finished = time.perf_counter()
+            queued_from = scheduled if scheduled is not None else sent_at
+            with records_lock:
+                records.append({
+                    'start': sent_at - started,
+                    'latency': finished - queued_from,
+                    'service_time': finished - sent_at,
+                    'status': status,
+                    'error': error,
+                })
+
+    def sample_rss():
+        while not done.is_set():
+            if target.pid is not None:
+                rss = read_rss(target.pid)
+                if rss is not None:
+                    rss_samples.append({'t': time.perf_counter() - started, 'rss_bytes': rss})
+            done.wait(rss_interval)
+
+    sampler = threading.Thread(target=sample_rss, name='rss-sampler', daemon=True)
+    producer = threading.Thread(target=produce, name='load-producer', daemon=True)
+    workers = [threading.Thread(target=work, args=(i,), name=f'load-worker-{i}', daemon=True)
+               for i in range(concurrency)]
+    sampler.start()
+    producer.start()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    return records, rss_samples, elapsed
+
+
+def summarize(records, rss_samples, elapsed, images_per_request):
+    """Aggregate raw request records into the report summary."""
+    total = len(records)
+    ok = [r for r in records if r['status'] is not None and 200 <= r['status'] < 300]
+    unavailable = [r for r in records if r['status'] == 503]
+    latencies = sorted(r['latency'] for r in ok)
+    service_times = sorted(r['service_time'] for r in ok)
+
+    status_counts = {}
+    for r in records:
+        key = str(r['status']) if r['status'] is not None else 'exception'
+        status_counts[key] = status_counts.get(key, 0) + 1
+
+    return {
+        'requests': total,
+        'succeeded': len(ok),
+        'elapsed_seconds': elapsed,
+        'throughput_rps': len(ok) / elapsed if elapsed > 0 else 0.0,
+        'images_per_second': len(ok) * images_per_request / elapsed if elapsed > 0 else 0.0,
+        'error_rate': (total - len(ok) - len(unavailable)) / total if total else 0.0,
+        'unavailable_rate': len(unavailable) / total if total else 0.0,
+        'status_counts': status_counts,
+        'latency_seconds': {f'p{p}': percentile(latencies, p) for p in PERCENTILES} |
+                           {'max': latencies[-1] if latencies else None},
+        'service_time_seconds': {f'p{p}': percentile(service_times, p) for p in PERCENTILES},
+        'rss_peak_bytes': max((s['rss_bytes'] for s in rss_samples), default=None),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the /process endpoint.")
+    parser.add_argument('--url', help="base URL of a running server (default: in-process test client)")
+    parser.add_argument('--server-pid', type=int, help="pid of the server, for RSS sampling in --url mode")
+    parser.add_argument('--concurrency', type=int, default=4, help="number of concurrent clients")
+    parser.add_argument('--images-per-request', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help="open-loop arrival rate in requests/second (default: closed loop)")
+    parser.add_argument('--requests', type=int, default=100, help="number of requests to send")
+    parser.add_argument('--duration', type=float, help="send requests for this many seconds instead")
+    parser.add_argument('--image', action='append', help="screenshot fixture (repeatable)")
+    parser.add_argument('--fixtures', type=int, default=4, help="number of synthetic fixtures without --image")
+    parser.add_argument('--rss-interval', type=float, default=0.5, help="seconds between RSS samples")
+    parser.add_argument('--ready-timeout', type=float, default=120.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.image:
+        fixtures = [load_fixture(path) for path in args.image]
+    else:
+        fixtures = [load_fixture(seed=seed) for seed in range(args.fixtures)]
+
+    target = HTTPTarget(args.url, args.server_pid) if args.url else TestClientTarget()
+    if args.url:
+        rss_source = 'server' if args.server_pid else 'none'
+    else:
+        rss_source = 'load-generator'
+        print("Note: in test-client mode RSS is the load generator's own process, including fixtures "
+              "and request records; use --url with --server-pid for server RSS")
+    target.wait_ready(args.ready_timeout)
+
+    records, rss_samples, elapsed = run_load(
+        target, fixtures,
+        concurrency=args.concurrency,
+        images_per_request=args.images_per_request,
+        rate=args.rate,
+        total_requests=args.requests,
+        duration=args.duration,
+        rss_interval=args.rss_interval,
+        seed=args.seed,
+    )
+    summary = summarize(records, rss_samples, elapsed, args.images_per_request)
+
+    print(f"requests: {summary['requests']} ({summary['succeeded']} ok) in {elapsed:.2f}s")
+    print(f"throughput: {summary['throughput_rps']:.2f} req/s, {summary['images_per_second']:.2f} images/s")
+    print("latency: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in summary['latency_seconds'].items()
+                                  if seconds is not None))
+    print(f"error rate: {summary['error_rate']:.2%}, 503 rate: {summary['unavailable_rate']:.2%}")
+    if summary['rss_peak_bytes'] is not None:
+        print(f"peak RSS ({rss_source}): {summary['rss_peak_bytes'] / 2**20:.1f} MiB")
+
+    if args.output:
+        report = {
+            'config': {
+                'target': args.url or 'test-client',
+                # In test-client mode the sampled process is the load generator itself
+                'rss_source': rss_source,
+                'concurrency': args.concurrency,
+                'images_per_request': args.images_per_request,
+                'rate': args.rate,
+                'requests': args.requests,
+                'duration': args.duration,
+                'fixtures': args.image or f'{args.fixtures} synthetic',
+                'seed': args.seed,
+                # Server-side batching settings, so runs with the wait at 0 and above 0 can be compared
+                'ocr_batch_wait_ms': os.environ.get('FTF_OCR_BATCH_WAIT_MS', '0') if not args.url else None,
+                'ocr_batch_size': os.environ.get('FTF_OCR_BATCH_SIZE', '8') if not args.url else None,
+            },
+            'summary': summary,
+            'rss': rss_samples,
+            'requests': records,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Before/after item-match check for catalog user-words.
+
+Runs the item-name extraction on each screenshot with plain OCR and with the catalog
+user-words file (FTF_OCR_USER_WORDS), and prints every box whose matched item differs.
+With --labels, also scores both runs against the expected item per box.
+
+The labels file maps screenshot file names to {box number: item name}, e.g.
+    {"inventory1.png": {"1": "Party Balloons", "2": "Spooky Brew"}}
+
+Usage:
+    python match_check.py --image inventory1.png --image inventory2.png [--labels labels.json]
+"""
+import argparse
+import json
+import os
+
+from backend import Text_Extract
+
+
+def extract_names(image_path, use_user_words):
+    """Return {box number: matched item name} for one screenshot."""
+    Text_Extract.USE_USER_WORDS = use_user_words
+    matches = Text_Extract.process_text_inventory(image_path) or {}
+    return {box_number: match['name'] for box_number, match in matches.items()}
+
+
+def score(names, expected):
+    """Number of labelled boxes whose matched name equals the label."""
+    return sum(1 for box_number, name in expected.items() if names.get(int(box_number)) == name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare item matches with and without catalog user-words.")
+    parser.add_argument('--image', action='append', required=True, help="real screenshot (repeatable)")
+    parser.add_argument('--labels', help="JSON file with the expected item per box")
+    args = parser.parse_args()
+
+    labels = {}
+    if args.labels:
+        with open(args.labels, 'r') as f:
+            labels = json.load(f)
+
+    changed = 0
+    correct = {False: 0, True: 0}
+    labelled = 0
+    for image_path in args.image:
+        image_name = os.path.basename(image_path)
+        runs = {use: extract_names(image_path, use) for use in (False, True)}
+        for box_number in sorted(set(runs[False]) | set(runs[True])):
+            before, after = runs[False].get(box_number), runs[True].get(box_number)
+            if before != after:
+                changed += 1
+                print(f"{image_name} box {box_number}: '{before}' -> '{after}'")
+        expected = labels.get(image_name, {})
+        labelled += len(expected)
+        for use in (False, True):
+            correct[use] += score(runs[use], expected)
+
+    print(f"{changed} boxes changed across {len(args.image)} screenshots")
+    if labelled:
+        print(f"without user-words: {correct[False]}/{labelled} correct")
+        print(f"with user-words:    {correct[True]}/{labelled} correct")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Parity check for OCR micro-batching.
+
+Runs the full extraction pipeline on each fixture with direct Tesseract calls,
+recording every image handed to OCR and the tokens it produced. Then it sends the
+same images concurrently through an OCRBatcher and checks that each caller gets
+exactly the same tokens back. Exits with status 1 if any image differs.
+
+Usage:
+    python ocr_parity.py [--image screenshot.png ...] [--wait-ms 5] [--batch-size 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+from benchmark import make_synthetic_screenshot
+from backend import ocr_batch
+
+
+def record_direct_calls(image_paths):
+    """Run the pipeline without batching and return the (image, config, tokens) of every OCR call."""
+    from backend.main import merge_and_calculate
+
+    calls = []
+    direct = ocr_batch.image_to_data
+
+    def recording(image, config):
+        tokens = direct(image, config)
+        calls.append((image, config, tokens))
+        return tokens
+
+    ocr_batch.configure(max_wait_ms=0)
+    ocr_batch.image_to_data = recording
+    try:
+        for path in image_paths:
+            merge_and_calculate([path])
+    finally:
+        ocr_batch.image_to_data = direct
+    return calls
+
+
+def run_batched(calls, wait_ms, batch_size):
+    """Send every recorded image through one batcher at the same time and return the tokens per call."""
+    batcher = ocr_batch.OCRBatcher(max_wait_ms=wait_ms, max_batch_size=batch_size)
+    results = [None] * len(calls)
+
+    def send(index):
+        image, config, _ = calls[index]
+        results[index] = batcher.image_to_data(image, config)
+
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that batched OCR returns the same tokens as direct OCR.")
+    parser.add_argument('--image', action='append', help="screenshot fixture (repeatable)")
+    parser.add_argument('--fixtures', type=int, default=4, help="number of synthetic fixtures without --image")
+    parser.add_argument('--wait-ms', type=float, default=5.0, help="batching latency budget")
+    parser.add_argument('--batch-size', type=int, default=8)
+    args = parser.parse_args()
+
+    temp_paths = []
+    image_paths = args.image or []
+    if not image_paths:
+        for seed in range(args.fixtures):
+            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
+                f.write(make_synthetic_screenshot(seed))
+            temp_paths.append(f.name)
+        image_paths = temp_paths
+
+    try:
+        calls = record_direct_calls(image_paths)
+        batched = run_batched(calls, args.wait_ms, args.batch_size)
+    finally:
+        for path in temp_paths:
+            os.unlink(path)
+
+    mismatches = 0
+    for index, ((_, config, direct_tokens), batched_tokens) in enumerate(zip(calls, batched)):
+        if batched_tokens != direct_tokens:
+            mismatches += 1
+            print(f"Mismatch on OCR call {index} ({config}):")
+            print(f"  direct:  {[t for t in direct_tokens['text'] if t.strip()]}")
+            print(f"  batched: {[t for t in batched_tokens['text'] if t.strip()]}")
+
+    print(f"{len(calls) - mismatches}/{len(calls)} OCR calls returned identical tokens when batched")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()